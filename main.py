@@ -1,14 +1,17 @@
 import os
 import asyncio
 import datetime
+import functools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from dotenv import load_dotenv
-from geopy.geocoders import Nominatim
-import requests
 
 from typing import Dict
 from typing import Annotated
 
 import aiohttp
+import orjson
 from twilio.rest import Client
 
 from livekit.agents import JobContext, WorkerOptions, cli, JobProcess, AutoSubscribe
@@ -20,8 +23,114 @@ from livekit.plugins import deepgram, silero, cartesia, openai
 # Load environment variables
 load_dotenv()
 
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+
+SYSTEM_PROMPT = (
+    "You are a helpful voice assistant designed for elderly users. "
+    "You can help with weather information, medication reminders, and emergency alerts. "
+    "Keep responses concise, short, and to the point. Speak naturally and warmly."
+)
+
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_HEADERS = {"User-Agent": "voice_assistant"}
+
+GEOCODE_CACHE_SIZE = 512
+_geocode_cache: "OrderedDict[str, tuple[float, float] | None]" = OrderedDict()
+
+def async_ttl_cache(ttl: float, maxsize: int = 256):
+    """Cache successful (status 200) response bodies of an async fetch(url, params) for ttl seconds"""
+    def decorator(fetch):
+        cache: Dict[tuple, tuple[float, bytes]] = {}
+
+        @functools.wraps(fetch)
+        async def wrapper(self, url: str, params: Dict | None = None) -> tuple[int, bytes]:
+            key = (url, tuple(sorted((params or {}).items())))
+            now = time.monotonic()
+            entry = cache.get(key)
+            if entry is not None and entry[0] > now:
+                return 200, entry[1]
+
+            status, body = await fetch(self, url, params)
+            if status == 200:
+                if len(cache) >= maxsize:
+                    for stale in [k for k, (expiry, _) in cache.items() if expiry <= now]:
+                        del cache[stale]
+                    if len(cache) >= maxsize:
+                        del cache[next(iter(cache))]
+                cache[key] = (now + ttl, body)
+            return status, body
+        return wrapper
+    return decorator
+
+@dataclass
+class TwilioConfig:
+    client: Client
+    from_number: str
+    to_number: str
+
+def load_twilio_config() -> TwilioConfig | None:
+    """Build the Twilio client from the environment, or None if alerts are not configured"""
+    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+    emergency_contact = os.getenv("EMERGENCY_CONTACT")
+    twilio_number = os.getenv("TWILIO_PHONE_NUMBER")
+
+    if not all([account_sid, auth_token, emergency_contact, twilio_number]):
+        return None
+    return TwilioConfig(Client(account_sid, auth_token), twilio_number, emergency_contact)
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create a pooled HTTP session that caches DNS and keeps connections warm"""
+    connector = aiohttp.TCPConnector(
+        limit=100,
+        limit_per_host=20,
+        ttl_dns_cache=300,
+        keepalive_timeout=75,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=10),
+        read_bufsize=10 * 1024 * 1024,
+    )
+
 class AssistantFnc(llm.FunctionContext):
-    
+    def __init__(self, session: aiohttp.ClientSession, twilio: TwilioConfig | None = None):
+        super().__init__()
+        self._session = session
+        self._twilio = twilio
+        # Cap concurrent requests per API; Nominatim is kept to one in flight at a time
+        # (its usage policy also limits clients to one request per second)
+        self._api_semaphores = {
+            WEATHER_URL: asyncio.Semaphore(5),
+            NOMINATIM_URL: asyncio.Semaphore(1),
+        }
+
+    async def _geocode(self, location: str) -> tuple[float, float] | None:
+        """Resolve a location to (latitude, longitude), caching repeat lookups"""
+        key = location.strip().lower()
+        if key in _geocode_cache:
+            _geocode_cache.move_to_end(key)
+            return _geocode_cache[key]
+
+        params = {"q": key, "format": "json", "limit": 1}
+        async with self._api_semaphores[NOMINATIM_URL]:
+            async with self._session.get(NOMINATIM_URL, params=params, headers=NOMINATIM_HEADERS) as response:
+                response.raise_for_status()
+                results = orjson.loads(await response.read())
+
+        coordinates = (float(results[0]["lat"]), float(results[0]["lon"])) if results else None
+        _geocode_cache[key] = coordinates
+        if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+            _geocode_cache.popitem(last=False)
+        return coordinates
+
+    @async_ttl_cache(ttl=300)
+    async def _fetch_weather(self, url: str, params: Dict | None = None) -> tuple[int, bytes]:
+        """Fetch raw weather data, reusing responses for the same query for five minutes"""
+        async with self._api_semaphores[url], self._session.get(url, params=params) as response:
+            return response.status, await response.read()
+
     @llm.ai_callable()
     async def get_weather(
         self,
@@ -29,24 +138,25 @@ class AssistantFnc(llm.FunctionContext):
     ):
         """Called when the user asks about the weather. This function will return the weather and humidity for the given location."""
         try:
-            geolocator = Nominatim(user_agent="voice_assistant")
-            location_data = geolocator.geocode(location)
-            if not location_data:
+            if not WEATHER_API_KEY:
+                return "Weather service is not properly configured."
+
+            coordinates = await self._geocode(location)
+            if not coordinates:
                 return "I couldn't find that location. Could you please be more specific?"
 
-            latitude, longitude = location_data.latitude, location_data.longitude
-            WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={WEATHER_API_KEY}"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        temp = data["main"]["temp"] - 273.15
-                        condition = data["weather"][0]["description"]
-                        humidity = data["main"]["humidity"]
-                        return f"It's currently {temp:.1f} degree Celsius with {condition}. The humidity is {humidity}%."
-                    else:
-                        return f"Failed to get weather data, status code: {response.status}"
+            latitude, longitude = coordinates
+            params = {"lat": latitude, "lon": longitude, "appid": WEATHER_API_KEY, "units": "metric"}
+            status, body = await self._fetch_weather(WEATHER_URL, params)
+            if status == 200:
+                data = orjson.loads(body)
+                main = data["main"]
+                temp = main["temp"]
+                humidity = main["humidity"]
+                condition = data["weather"][0]["description"]
+                return f"It's currently {temp:.1f} degree Celsius with {condition}. The humidity is {humidity}%."
+            else:
+                return f"Failed to get weather data, status code: {status}"
         except Exception as e:
             return f"I'm having trouble getting the weather information right now. {str(e)}"
 
@@ -54,22 +164,18 @@ class AssistantFnc(llm.FunctionContext):
     async def get_alerts(self):
         """Called when the user requests an emergency alert. This function will send an SMS alert to the designated emergency contact."""
         try:
-            account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-            auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-            emergency_contact = os.getenv("EMERGENCY_CONTACT")
-            twilio_number = os.getenv("TWILIO_PHONE_NUMBER")
-
-            if not all([account_sid, auth_token, emergency_contact, twilio_number]):
+            twilio = self._twilio
+            if twilio is None:
                 return "Emergency alert service is not properly configured."
 
-            client = Client(account_sid, auth_token)
-            message = client.messages.create(
+            await asyncio.to_thread(
+                twilio.client.messages.create,
                 body="Emergency alert triggered! Please check on the user immediately.",
-                from_=twilio_number,
-                to=emergency_contact,
+                from_=twilio.from_number,
+                to=twilio.to_number,
             )
 
-            return f"Emergency alert sent successfully to {emergency_contact}."
+            return f"Emergency alert sent successfully to {twilio.to_number}."
         except Exception as e:
             return f"Failed to send emergency alert. Error: {str(e)}"
 
@@ -77,46 +183,72 @@ class AssistantFnc(llm.FunctionContext):
 def prewarm(proc: JobProcess):
     """Initialize models before main execution"""
     proc.userdata["vad"] = silero.VAD.load()
-
-async def entrypoint(ctx: JobContext):
-    """Main entry point for the enhanced voice assistant"""
-    initial_ctx = ChatContext(
-        messages=[
-            ChatMessage(
-                role="assistant",
-                content="""You are a helpful voice assistant designed for elderly users. 
-                You can help with weather information, medication reminders, and emergency alerts. 
-                Keep responses concise, short, and to the point. Speak naturally and warmly."""
-            )
-        ]
+    proc.userdata["twilio"] = load_twilio_config()
+    proc.userdata["initial_ctx"] = ChatContext(
+        messages=[ChatMessage(role="assistant", content=SYSTEM_PROMPT)]
     )
 
-    agent = VoiceAssistant(
-        vad=ctx.proc.userdata["vad"],
+def build_agent(
+    *,
+    vad: silero.VAD,
+    chat_ctx: ChatContext,
+    fnc_ctx: llm.FunctionContext,
+    stt_lang: str = "hi",
+    stt_model: str = "nova-2-general",
+    llm_model: str = "llama-3.3-70b",
+    tts_voice: str = "3b554273-4299-48b9-9aaf-eefd438e3941",
+) -> VoiceAssistant:
+    """Construct the voice assistant pipeline with the given STT, LLM and TTS settings"""
+    return VoiceAssistant(
+        vad=vad,
         stt=deepgram.STT(
-            language="hi",
-            model="nova-2-general"
+            language=stt_lang,
+            model=stt_model
         ),
         llm=openai.LLM(
             base_url="https://api.cerebras.ai/v1",
             api_key=os.environ.get("CEREBRAS_API_KEY"),
-            model="llama-3.3-70b", 
+            model=llm_model,
         ),
         tts=cartesia.TTS(
-            voice="3b554273-4299-48b9-9aaf-eefd438e3941"
+            voice=tts_voice
         ),
-        chat_ctx=initial_ctx,
+        chat_ctx=chat_ctx,
         allow_interruptions=True,
         interrupt_speech_duration=0.5,
         interrupt_min_words=0,
         min_endpointing_delay=0.5,
-        fnc_ctx=AssistantFnc()
+        fnc_ctx=fnc_ctx
+    )
+
+async def entrypoint(ctx: JobContext):
+    """Main entry point for the enhanced voice assistant"""
+    initial_ctx = ctx.proc.userdata["initial_ctx"].copy()
+
+    # One HTTP session per job, created inside the job's event loop
+    session = create_http_session()
+    ctx.add_shutdown_callback(session.close)
+
+    fnc_ctx = AssistantFnc(session=session, twilio=ctx.proc.userdata["twilio"])
+
+    agent = build_agent(
+        vad=ctx.proc.userdata["vad"],
+        chat_ctx=initial_ctx,
+        fnc_ctx=fnc_ctx,
     )
 
+    # Greet as soon as the user's audio track is subscribed, waiting no longer than the
+    # previous fixed one-second delay if no track is published
+    track_subscribed = asyncio.Event()
+    ctx.room.on("track_subscribed", lambda *_: track_subscribed.set())
+
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
     agent.start(ctx.room)
-    
-    await asyncio.sleep(1)
+
+    try:
+        await asyncio.wait_for(track_subscribed.wait(), timeout=1.0)
+    except asyncio.TimeoutError:
+        pass
     await agent.say(
         "Hello, I'm Shaalini, your personal assistant. What would you like to do?",
         allow_interruptions=True